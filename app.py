@@ -1,27 +1,44 @@
 import os
 import io
-import atexit
+import re
+import asyncio
+import json
+import hashlib
+import threading
+import queue
+import time
 import tempfile
 from datetime import datetime
 import streamlit as st
 from dotenv import load_dotenv
-from groq import Groq
-import yfinance as yf
+from groq import Groq, AsyncGroq, GroqError
+import yfinance_cache as yf
+from yfinance_cache import yfc_cache_manager
 from duckduckgo_search import DDGS
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_JUSTIFY
+from duckduckgo_search.exceptions import DuckDuckGoSearchException
 import pandas as pd
 import bcrypt
 import sqlite3
 from functools import wraps
-import plotly.graph_objects as go
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FetchTimeoutError
 
 load_dotenv()
-now = datetime.now()
-current_time = now.strftime("%Y-%m-%d %H:%M:%S")
-client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+MAX_CHART_POINTS = 500
+
+class MarketDataError(Exception):
+    """Raised when market data for a ticker cannot be fetched."""
+
+# Errors expected from the data sources; network failures surface as OSError subclasses
+YFINANCE_ERRORS = (MarketDataError, KeyError, ValueError)
+NEWS_ERRORS = (OSError, DuckDuckGoSearchException, KeyError)
+
+# Persistent on-disk cache shared by all Streamlit workers
+CACHE_DIR = os.environ.get("INVESTA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "investa"))
+NEWS_CACHE_TTL = 6 * 3600
+NEWS_TIMEOUT = 4.0
+os.makedirs(CACHE_DIR, exist_ok=True)
+yfc_cache_manager.SetCacheDirpath(os.path.join(CACHE_DIR, "yfc"))
 
 st.set_page_config(
     page_title="Investa Analyzr",
@@ -33,15 +50,41 @@ st.set_page_config(
 )
 
 # Database setup
-conn = sqlite3.connect('users.db')
-c = conn.cursor()
-c.execute('''CREATE TABLE IF NOT EXISTS users
-             (username TEXT PRIMARY KEY, password TEXT, usage_count INTEGER, last_reset DATE)''')
-conn.commit()
+DB_PATH = 'users.db'
+
+# Idle connections shared across reruns, which each run on a new script thread. A connection is
+# only used by the thread that borrowed it, so it may be opened with check_same_thread=False.
+@st.cache_resource
+def get_db_pool():
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute('''CREATE TABLE IF NOT EXISTS users
+                     (username TEXT PRIMARY KEY, password TEXT, usage_count INTEGER, last_reset DATE)''')
+    conn.close()
+    return queue.SimpleQueue()
+
+# Borrows a pooled connection for one transaction and returns it to the pool afterwards
+@contextmanager
+def get_connection():
+    pool = get_db_pool()
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+    try:
+        with conn:
+            yield conn
+    finally:
+        pool.put(conn)
 
 # User authentication functions
+BCRYPT_ROUNDS = 10
+
 def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
 
 def verify_password(stored_password, provided_password):
     return bcrypt.checkpw(provided_password.encode('utf-8'), stored_password.encode('utf-8'))
@@ -49,36 +92,34 @@ def verify_password(stored_password, provided_password):
 def create_user(username, password):
     hashed_password = hash_password(password)
     try:
-        c.execute("INSERT INTO users (username, password, usage_count, last_reset) VALUES (?, ?, ?, ?)",
-                  (username, hashed_password, 0, datetime.now().date()))
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute("INSERT INTO users (username, password, usage_count, last_reset) VALUES (?, ?, ?, ?)",
+                         (username, hashed_password, 0, datetime.now().date()))
         return True
     except sqlite3.IntegrityError:
         return False
 
 def authenticate_user(username, password):
-    c.execute("SELECT password FROM users WHERE username = ?", (username,))
-    result = c.fetchone()
+    with get_connection() as conn:
+        result = conn.execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()
     if result and verify_password(result[0], password):
         return True
     return False
 
-def reset_usage_if_new_day(username):
-    c.execute("SELECT last_reset FROM users WHERE username = ?", (username,))
-    last_reset = c.fetchone()[0]
-    if last_reset != datetime.now().date():
-        c.execute("UPDATE users SET usage_count = 0, last_reset = ? WHERE username = ?",
-                  (datetime.now().date(), username))
-        conn.commit()
-
-def increment_usage(username):
-    reset_usage_if_new_day(username)
-    c.execute("UPDATE users SET usage_count = usage_count + 1 WHERE username = ?", (username,))
-    conn.commit()
+def increment_usage(username, count=1):
+    # Resets the counter on the first reports of a new day and adds to it otherwise
+    today = datetime.now().date()
+    with get_connection() as conn:
+        conn.execute("""UPDATE users
+                        SET usage_count = CASE WHEN last_reset = ? THEN usage_count + ? ELSE ? END,
+                            last_reset = ?
+                        WHERE username = ?""",
+                     (today, count, count, today, username))
 
 def get_usage_count(username):
-    c.execute("SELECT usage_count FROM users WHERE username = ?", (username,))
-    return c.fetchone()[0]
+    with get_connection() as conn:
+        return conn.execute("SELECT CASE WHEN last_reset = ? THEN usage_count ELSE 0 END FROM users WHERE username = ?",
+                            (datetime.now().date(), username)).fetchone()[0]
 
 def login_required(func):
     @wraps(func)
@@ -90,38 +131,148 @@ def login_required(func):
     return wrapper
 
 # Caching for performance improvement
-@st.cache_data(ttl=3600)
+# Clients are shared across reruns so their HTTP connection pools stay warm
+@st.cache_resource
+def get_groq_client():
+    return Groq(api_key=os.environ.get("GROQ_API_KEY"))
+
+# This and the data getters below run on fetch pool threads, so they disable the spinner,
+# which needs the script run context
+@st.cache_resource(show_spinner=False)
+def get_ddgs():
+    return DDGS()
+
+def market_data(func):
+    # yfinance_cache raises bare Exceptions for unknown or delisted tickers, so fold every failure into MarketDataError
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except MarketDataError:
+            raise
+        except Exception as e:
+            raise MarketDataError(str(e)) from e
+    return wrapper
+
+@st.cache_resource(ttl=900, max_entries=256, show_spinner=False)
+@market_data
+def get_ticker(ticker_symbol):
+    return yf.Ticker(ticker_symbol)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+@market_data
 def get_stock_info(ticker_input):
-    ticker = yf.Ticker(ticker_input)
-    return ticker.info
+    return get_ticker(ticker_input).info
 
-@st.cache_data(ttl=3600)
+@st.cache_data(ttl=3600, show_spinner=False)
 def get_company_news(ticker_input):
-    ddgs = DDGS()
-    return list(ddgs.news(keywords=ticker_input, max_results=5))
-
-@st.cache_data(ttl=3600)
+    # Hashing keeps tickers such as BRK.B and BRKB from sharing a file
+    name_hash = hashlib.blake2b(ticker_input.encode('utf-8'), digest_size=16).hexdigest()
+    cache_path = os.path.join(CACHE_DIR, f"news_{name_hash}.json")
+    try:
+        if time.time() - os.path.getmtime(cache_path) < NEWS_CACHE_TTL:
+            with open(cache_path, encoding="utf-8") as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+    ddgs = get_ddgs()
+    news = list(ddgs.news(keywords=ticker_input, max_results=5))
+    # Write to a temporary file and swap it in, so other workers never read a partial file
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=CACHE_DIR, suffix=".tmp", delete=False) as f:
+        json.dump(news, f)
+    os.replace(f.name, cache_path)
+    return news
+
+@st.cache_data(ttl=3600, show_spinner=False)
+@market_data
 def get_analyst_recommendations(ticker_symbol):
-    ticker = yf.Ticker(ticker_symbol)
-    return ticker.recommendations
+    return get_ticker(ticker_symbol).recommendations
 
-@st.cache_data(ttl=3600)
+@st.cache_data(ttl=3600, show_spinner=False)
+@market_data
 def get_stock_history(ticker_symbol, period='1y'):
-    ticker = yf.Ticker(ticker_symbol)
-    return ticker.history(period=period)
-
-def generate_report(report_input):
-    description = "You are a Senior Investment Analyst for Goldman Sachs tasked with producing a research report for a very important client."
-    instructions = [
-        "You will be provided with a stock and information from junior researchers.",
-        "Carefully read the research and generate a final - Goldman Sachs worthy investment report.",
-        "Make your report engaging, informative, and well-structured.",
-        "When you share numbers, make sure to include the units (e.g., millions/billions) and currency.",
-        "REMEMBER: This report is for a very important client, so the quality of the report is important.",
-        "Make sure your report is properly formatted in md and follows the <report_format> provided below.",
-        "IMPORTANT: Make sure to say whether to invest in the given stock or not.",
-    ]
-    report_format = """
+    return get_ticker(ticker_symbol).history(period=period)
+
+# Independent network fetches of a report run concurrently on the given executor
+FETCHES_PER_TICKER = 4
+
+def start_fetches(executor, ticker_symbol, period, show_chart):
+    # The price history is only needed for the chart
+    return (
+        executor.submit(get_stock_info, ticker_symbol),
+        executor.submit(get_company_news, ticker_symbol),
+        executor.submit(get_analyst_recommendations, ticker_symbol),
+        executor.submit(get_stock_history, ticker_symbol, period) if show_chart else None,
+    )
+
+# (label, info key) pairs listed in the Company Info section, in order
+COMPANY_INFO_FIELDS = [
+    ("Name", "shortName"),
+    ("Symbol", "symbol"),
+    ("Current Stock Price", "regularMarketPrice"),
+    ("Market Cap", "marketCap"),
+    ("Sector", "sector"),
+    ("Industry", "industry"),
+    ("Address", "address1"),
+    ("City", "city"),
+    ("State", "state"),
+    ("Zip", "zip"),
+    ("Country", "country"),
+    ("EPS", "trailingEps"),
+    ("P/E Ratio", "trailingPE"),
+    ("52 Week Low", "fiftyTwoWeekLow"),
+    ("52 Week High", "fiftyTwoWeekHigh"),
+    ("50 Day Average", "fiftyDayAverage"),
+    ("200 Day Average", "twoHundredDayAverage"),
+    ("Website", "website"),
+    ("Summary", "longBusinessSummary"),
+    ("Analyst Recommendation", "recommendationKey"),
+    ("Number Of Analyst Opinions", "numberOfAnalystOpinions"),
+    ("Employees", "fullTimeEmployees"),
+    ("Total Cash", "totalCash"),
+    ("Free Cash flow", "freeCashflow"),
+    ("Operating Cash flow", "operatingCashflow"),
+    ("EBITDA", "ebitda"),
+    ("Revenue Growth", "revenueGrowth"),
+    ("Gross Margins", "grossMargins"),
+    ("Ebitda Margins", "ebitdaMargins"),
+]
+# Keys used when the primary one is missing, and labels whose value is shown with its currency
+COMPANY_INFO_FALLBACKS = {"regularMarketPrice": "currentPrice", "marketCap": "enterpriseValue"}
+COMPANY_INFO_WITH_CURRENCY = {"Current Stock Price", "Market Cap"}
+# Every info key the section reads, used to project the few needed out of the full info dict
+COMPANY_INFO_KEYS = frozenset(key for _, key in COMPANY_INFO_FIELDS) | frozenset(COMPANY_INFO_FALLBACKS.values()) | {"currency"}
+
+# Report input sections, most important first; lower-priority ones are dropped when over budget
+SECTION_COMPANY_INFO = 0
+SECTION_UPGRADES_DOWNGRADES = 1
+SECTION_RECOMMENDATIONS = 2
+SECTION_NEWS = 3
+REPORT_CHAR_BUDGET = 24000  # roughly 6k tokens at ~4 characters per token
+MAX_RECOMMENDATION_ROWS = 12
+
+def pack_report_sections(report_sections):
+    kept = set()
+    used = 0
+    for index in sorted(range(len(report_sections)), key=lambda i: report_sections[i][0]):
+        size = len(report_sections[index][1])
+        if used + size <= REPORT_CHAR_BUDGET:
+            kept.add(index)
+            used += size
+    return "".join(text for index, (_, text) in enumerate(report_sections) if index in kept)
+
+# The static part of the prompt is built once and sent as the system message
+REPORT_DESCRIPTION = "You are a Senior Investment Analyst for Goldman Sachs tasked with producing a research report for a very important client."
+REPORT_INSTRUCTIONS = [
+    "You will be provided with a stock and information from junior researchers.",
+    "Carefully read the research and generate a final - Goldman Sachs worthy investment report.",
+    "Make your report engaging, informative, and well-structured.",
+    "When you share numbers, make sure to include the units (e.g., millions/billions) and currency.",
+    "REMEMBER: This report is for a very important client, so the quality of the report is important.",
+    "Make sure your report is properly formatted in md and follows the <report_format> provided below.",
+    "IMPORTANT: Make sure to say whether to invest in the given stock or not.",
+]
+REPORT_FORMAT = """
     # [Company Name]: Investment Report
 
     ### Overview
@@ -161,40 +312,268 @@ def generate_report(report_input):
 
     Report generated on: {current_time}
     """
-    prompt = f"{description}\n\nInstructions: {', '.join(instructions)}\n\nReport Format:\n{report_format}\n\nCompany Information: {report_input}\n\nCurrent Time : {current_time}\n\n"
+SYSTEM_PROMPT = f"{REPORT_DESCRIPTION}\n\nInstructions: {', '.join(REPORT_INSTRUCTIONS)}\n\nReport Format:\n{REPORT_FORMAT}"
+# The fast model serves on-screen previews; a report made for a PDF download gets the larger one
+REPORT_MODEL = "llama-3.1-8b-instant"
+PDF_REPORT_MODEL = "llama-3.3-70b-versatile"
+
+def build_report_messages(report_input):
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Company Information: {report_input}\n\nCurrent Time : {current_time}\n\n"},
+    ]
 
-    chat_completion = client.chat.completions.create(
-        messages=[{"role": "user", "content": prompt}],
-        model="llama-3.1-8b-instant",
+def generate_report(report_input, model=REPORT_MODEL):
+    stream = get_groq_client().chat.completions.create(
+        messages=build_report_messages(report_input),
+        model=model,
+        stream=True,
     )
 
-    return chat_completion.choices[0].message.content
+    for chunk in stream:
+        yield chunk.choices[0].delta.content or ""
+
+# Several tickers are sent to Groq concurrently; failures are returned in place of their report
+async def generate_reports(report_inputs, model=REPORT_MODEL):
+    async with AsyncGroq(api_key=os.environ.get("GROQ_API_KEY")) as async_client:
+        completions = await asyncio.gather(
+            *(async_client.chat.completions.create(messages=build_report_messages(report_input), model=model)
+              for report_input in report_inputs),
+            return_exceptions=True,
+        )
+    return [completion if isinstance(completion, Exception) else completion.choices[0].message.content
+            for completion in completions]
+
+# Finished reports keyed by a hash of their input, shared by all sessions
+REPORT_CACHE_TTL = 3600
+REPORT_CACHE_SIZE = 128
+
+# Shared by all sessions, so every access holds the lock
+@st.cache_resource
+def get_report_cache():
+    return {}, threading.Lock()
+
+def report_cache_key(ticker, report_input, model):
+    # The ticker is part of the key because the input only names it in the Company Info section
+    return hashlib.blake2b(f"{ticker}\n{model}\n{report_input}".encode('utf-8'), digest_size=16).hexdigest()
+
+def get_cached_report(ticker, report_input, model):
+    cache, lock = get_report_cache()
+    with lock:
+        entry = cache.get(report_cache_key(ticker, report_input, model))
+    if entry and time.time() - entry[0] < REPORT_CACHE_TTL:
+        return entry[1]
+    return None
+
+def cache_report(ticker, report_input, model, report):
+    cache, lock = get_report_cache()
+    with lock:
+        cache[report_cache_key(ticker, report_input, model)] = (time.time(), report)
+        while len(cache) > REPORT_CACHE_SIZE:
+            cache.pop(next(iter(cache)))
+
+# Reports kept in the session expire like the shared cache, so a later click for the same input fetches fresh data
+def get_stored_report(key):
+    entry = st.session_state.get(key)
+    if entry and time.time() - entry[0] < REPORT_CACHE_TTL:
+        return entry[1]
+    return None
+
+def store_report(key, report):
+    st.session_state[key] = (time.time(), report)
+
+# Matches a heading ('# ' or '### ') or a bullet ('- ') in a single pass
+PDF_LINE_RE = re.compile(r'(#|###) (.*)|- (.*)')
+PDF_BULLET = "\u2022 "
+
+# ReportLab is only needed for "Download PDF", so it is imported and its styles built on first use.
+# st.cache_resource keeps them across reruns, which re-execute this script and would reset an lru_cache.
+@st.cache_resource(show_spinner=False)
+def get_pdf_styles():
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_JUSTIFY
+
+    # Spacing lives on the styles so each block is a single flowable, without a separate Spacer
+    styles = getSampleStyleSheet()
+    title = styles['Title']
+    heading = styles['Heading3']
+    headings = {
+        '#': ParagraphStyle(name='ReportTitle', parent=title, spaceAfter=title.spaceAfter + 12),
+        '###': ParagraphStyle(name='ReportHeading3', parent=heading, spaceAfter=heading.spaceAfter + 6),
+    }
+    bullet = ParagraphStyle(name='ReportBullet', parent=styles['BodyText'], spaceAfter=6)
+    body = ParagraphStyle(name='Justify', alignment=TA_JUSTIFY, spaceAfter=6)
+    return headings, bullet, body
 
+@st.cache_data(ttl=3600)
 def generate_pdf(content):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import BaseDocTemplate, PageTemplate, Frame, Paragraph
+
+    headings, bullet_style, body_style = get_pdf_styles()
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name='Justify', alignment=TA_JUSTIFY))
+    doc = BaseDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18,
+                          pageCompression=1)
+    # The styles' spaceAfter replaces Spacer flowables, so it must add to the next spaceBefore, not overlap it
+    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal', overlapAttachedSpace=0)
+    doc.addPageTemplates([PageTemplate(id='report', frames=[frame])])
 
     flowables = []
+    # Consecutive lines of the same kind are merged into one Paragraph
+    block = []
+    block_style = None
+
+    def flush_block():
+        if block:
+            flowables.append(Paragraph("<br/>".join(block), block_style))
+            block.clear()
 
     for line in content.split('\n'):
-        if line.startswith('# '):
-            flowables.append(Paragraph(line[2:], styles['Title']))
-            flowables.append(Spacer(1, 12))
-        elif line.startswith('### '):
-            flowables.append(Paragraph(line[4:], styles['Heading3']))
-            flowables.append(Spacer(1, 6))
-        elif line.startswith('- '):
-            flowables.append(Paragraph(f"• {line[2:]}", styles['BodyText']))
+        match = PDF_LINE_RE.match(line)
+        if match and match.group(1):
+            flush_block()
+            flowables.append(Paragraph(match.group(2), headings[match.group(1)]))
+        elif not line.strip():
+            flush_block()
         else:
-            flowables.append(Paragraph(line, styles['Justify']))
+            if match:
+                style, text = bullet_style, PDF_BULLET + match.group(3)
+            else:
+                style, text = body_style, line
+            if style is not block_style:
+                flush_block()
+                block_style = style
+            block.append(text)
+
+    flush_block()
+    doc.build(flowables)
+    return buffer.getvalue()
+
+# Shows the progress of one ticker's fetches and returns its packed report input
+def collect_report_input(ticker, fetches, show_chart):
+    report_sections = []
+
+    info_future, news_future, recommendations_future, history_future = fetches
+
+    # Get Company Info from YFinance
+    with st.status("Getting Company Info") as status:
+        try:
+            company_info_full = info_future.result()
+            if company_info_full:
+                company_info = {key: company_info_full[key] for key in COMPANY_INFO_KEYS & company_info_full.keys()}
+                currency = company_info.get("currency", "USD")
+                company_info_cleaned = {
+                    label: f"{value} {currency}" if label in COMPANY_INFO_WITH_CURRENCY else value
+                    for label, key in COMPANY_INFO_FIELDS
+                    if (value := company_info.get(key, company_info.get(COMPANY_INFO_FALLBACKS.get(key))))
+                }
+                company_info_md = ["## Company Info\n\n"]
+                company_info_md.extend(f"  - {key}: {value}\n\n" for key, value in company_info_cleaned.items())
+                report_sections.append((SECTION_COMPANY_INFO, "".join([
+                    "This section contains information about the company.\n\n",
+                    *company_info_md,
+                    "---\n",
+                ])))
+            status.update(label="Company Info available", state="complete", expanded=False)
+        except YFINANCE_ERRORS as e:
+            st.error(f"An error occurred while retrieving company info: {e}")
+
+    # Get Company News from DuckDuckGo
+    with st.status("Getting Company News") as status:
+        try:
+            # News is optional for the report, so a slow search is dropped instead of awaited
+            news_label = "Company News available"
+            try:
+                company_news = news_future.result(timeout=NEWS_TIMEOUT)
+            except FetchTimeoutError:
+                company_news = []
+                news_label = "Company News timed out"
+            if len(company_news) > 0:
+                company_news_md = ["## Company News\n\n\n"]
+                for news_item in company_news:
+                    company_news_md.append(f"#### {news_item['title']}\n\n")
+                    if "date" in news_item:
+                        company_news_md.append(f"  - Date: {news_item['date']}\n\n")
+                    if "url" in news_item:
+                        company_news_md.append(f"  - Link: {news_item['url']}\n\n")
+                    if "source" in news_item:
+                        company_news_md.append(f"  - Source: {news_item['source']}\n\n")
+                    if "body" in news_item:
+                        company_news_md.append(news_item['body'])
+                    company_news_md.append("\n\n")
+                report_sections.append((SECTION_NEWS, "".join([
+                    "This section contains the most recent news articles about the company.\n\n",
+                    *company_news_md,
+                    "---\n",
+                ])))
+            status.update(label=news_label, state="complete", expanded=False)
+        except NEWS_ERRORS as e:
+            st.error(f"An error occurred while retrieving company news: {e}")
+
+    # Get Analyst Recommendations
+    with st.status("Getting Analyst Recommendations") as status:
+        try:
+            analyst_recommendations = recommendations_future.result()
+            if analyst_recommendations is not None and not analyst_recommendations.empty:
+                analyst_recommendations_md = analyst_recommendations.tail(MAX_RECOMMENDATION_ROWS).to_markdown()
+                report_sections.append((SECTION_RECOMMENDATIONS, "".join([
+                    "## Analyst Recommendations\n\n",
+                    "This table outlines the most recent analyst recommendations for the stock.\n\n",
+                    f"{analyst_recommendations_md}\n",
+                    "---\n",
+                ])))
+            status.update(label="Analyst Recommendations available", state="complete", expanded=False)
+        except YFINANCE_ERRORS as e:
+            st.error(f"An error occurred while retrieving analyst recommendations: {e}")
+
+    # Get Upgrades/Downgrades
+    with st.status("Getting Upgrades/Downgrades") as status:
+        try:
+            analyst_recommendations = recommendations_future.result()
+            if analyst_recommendations is not None and not analyst_recommendations.empty:
+                upgrades_downgrades = analyst_recommendations[analyst_recommendations['Action'].isin(['upgraded', 'downgraded'])].head(2)
+                if not upgrades_downgrades.empty:
+                    upgrades_downgrades_md = "".join(
+                        f"- {row['Firm']} {row['Action']} the stock to {row['To Grade']}.\n"
+                        for _, row in upgrades_downgrades.iterrows()
+                    )
+                    report_sections.append((SECTION_UPGRADES_DOWNGRADES, "".join([
+                        "## Upgrades/Downgrades\n\n",
+                        "This section outlines the most recent upgrades and downgrades for the stock.\n\n",
+                        f"{upgrades_downgrades_md}\n",
+                        "---\n",
+                    ])))
+            else:
+                st.info("No recent upgrades or downgrades available.")
+
+        except YFINANCE_ERRORS as e:
+            st.error(f"An error occurred while retrieving upgrades/downgrades: {e}")
+        status.update(label="Upgrades/Downgrades checked", state="complete", expanded=False)
+
+    # Get Historical Data
+    if show_chart:
+        import plotly.graph_objects as go
 
-        flowables.append(Spacer(1, 6))
+        with st.spinner("Getting Historical Data"):
+            try:
+                historical_data = history_future.result()
+                if not historical_data.empty:
+                    # Downsample long periods to at most ~MAX_CHART_POINTS candles
+                    step = max(1, len(historical_data) // MAX_CHART_POINTS)
+                    chart_data = historical_data.iloc[::step]
+                    fig = go.Figure(data=[go.Candlestick(x=chart_data.index,
+                                open=chart_data['Open'],
+                                high=chart_data['High'],
+                                low=chart_data['Low'],
+                                close=chart_data['Close'])])
+                    fig.update_layout(title=f'{ticker} Stock Price', xaxis_title='Date', yaxis_title='Price')
+                    st.plotly_chart(fig)
+                    st.success("Historical Data retrieved successfully")
+            except YFINANCE_ERRORS as e:
+                st.error(f"An error occurred while retrieving historical data: {e}")
 
-    doc.build(flowables)
-    buffer.seek(0)
-    return buffer
+    return pack_report_sections(report_sections)
 
 @login_required
 def main():
@@ -217,12 +596,8 @@ def main():
             unsafe_allow_html=True,
         )
 
-    if usage_count >= 5:
-        st.warning("You have reached your daily limit of 5 reports. Please try again tomorrow.")
-        return
-
     ticker_input = st.text_input(
-        ":money_with_wings: Enter a ticker to research",
+        ":money_with_wings: Enter a ticker to research (separate several with commas)",
         value="NVDA",
     )
 
@@ -241,157 +616,120 @@ def main():
         ["1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "ytd", "max"],
         index = 3,
     )
+    show_chart = st.sidebar.checkbox("Show price chart", value=True)
 
-    if generate_report_btn or download_report_btn:
-        increment_usage(username)
-        st.session_state["topic"] = ticker_input
-        report_topic = st.session_state["topic"]
-
-        report_input = ""
+    if not (generate_report_btn or download_report_btn):
+        return
 
-        # Get Company Info from YFinance
-        with st.status("Getting Company Info") as status:
-            try:
-                company_info_full = get_stock_info(ticker_input)
-                if company_info_full:
-                    company_info_cleaned = {
-                        "Name": company_info_full.get("shortName"),
-                        "Symbol": company_info_full.get("symbol"),
-                        "Current Stock Price": f"{company_info_full.get('regularMarketPrice', company_info_full.get('currentPrice'))} {company_info_full.get('currency', 'USD')}",
-                        "Market Cap": f"{company_info_full.get('marketCap', company_info_full.get('enterpriseValue'))} {company_info_full.get('currency', 'USD')}",
-                        "Sector": company_info_full.get("sector"),
-                        "Industry": company_info_full.get("industry"),
-                        "Address": company_info_full.get("address1"),
-                        "City": company_info_full.get("city"),
-                        "State": company_info_full.get("state"),
-                        "Zip": company_info_full.get("zip"),
-                        "Country": company_info_full.get("country"),
-                        "EPS": company_info_full.get("trailingEps"),
-                        "P/E Ratio": company_info_full.get("trailingPE"),
-                        "52 Week Low": company_info_full.get("fiftyTwoWeekLow"),
-                        "52 Week High": company_info_full.get("fiftyTwoWeekHigh"),
-                        "50 Day Average": company_info_full.get("fiftyDayAverage"),
-                        "200 Day Average": company_info_full.get("twoHundredDayAverage"),
-                        "Website": company_info_full.get("website"),
-                        "Summary": company_info_full.get("longBusinessSummary"),
-                        "Analyst Recommendation": company_info_full.get("recommendationKey"),
-                        "Number Of Analyst Opinions": company_info_full.get("numberOfAnalystOpinions"),
-                        "Employees": company_info_full.get("fullTimeEmployees"),
-                        "Total Cash": company_info_full.get("totalCash"),
-                        "Free Cash flow": company_info_full.get("freeCashflow"),
-                        "Operating Cash flow": company_info_full.get("operatingCashflow"),
-                        "EBITDA": company_info_full.get("ebitda"),
-                        "Revenue Growth": company_info_full.get("revenueGrowth"),
-                        "Gross Margins": company_info_full.get("grossMargins"),
-                        "Ebitda Margins": company_info_full.get("ebitdaMargins"),
-                    }
-                    company_info_md = "## Company Info\n\n"
-                    for key, value in company_info_cleaned.items():
-                        if value:
-                            company_info_md += f"  - {key}: {value}\n\n"
-                    report_input += "This section contains information about the company.\n\n"
-                    report_input += company_info_md
-                    report_input += "---\n"
-                status.update(label="Company Info available", state="complete", expanded=False)
-            except Exception as e:
-                st.error(f"An error occurred while retrieving company info: {e}")
-
-        # Get Company News from DuckDuckGo
-        with st.status("Getting Company News") as status:
-            try:
-                company_news = get_company_news(ticker_input)
-                if len(company_news) > 0:
-                    company_news_md = "## Company News\n\n\n"
-                    for news_item in company_news:
-                        company_news_md += f"#### {news_item['title']}\n\n"
-                        if "date" in news_item:
-                            company_news_md += f"  - Date: {news_item['date']}\n\n"
-                        if "url" in news_item:
-                            company_news_md += f"  - Link: {news_item['url']}\n\n"
-                        if "source" in news_item:
-                            company_news_md += f"  - Source: {news_item['source']}\n\n"
-                        if "body" in news_item:
-                            company_news_md += f"{news_item['body']}"
-                        company_news_md += "\n\n"
-                    report_input += "This section contains the most recent news articles about the company.\n\n"
-                    report_input += company_news_md
-                    report_input += "---\n"
-                status.update(label="Company News available", state="complete", expanded=False)
-            except Exception as e:
-                st.error(f"An error occurred while retrieving company news: {e}")
-
-        # Get Analyst Recommendations
-        with st.status("Getting Analyst Recommendations") as status:
-            try:
-                analyst_recommendations = get_analyst_recommendations(ticker_input)
-                if analyst_recommendations is not None and not analyst_recommendations.empty:
-                    analyst_recommendations_md = analyst_recommendations.to_markdown()
-                    report_input += "## Analyst Recommendations\n\n"
-                    report_input += "This table outlines the most recent analyst recommendations for the stock.\n\n"
-                    report_input += f"{analyst_recommendations_md}\n"
-                    report_input += "---\n"
-                status.update(label="Analyst Recommendations available", state="complete", expanded=False)
-            except Exception as e:
-                st.error(f"An error occurred while retrieving analyst recommendations: {e}")
-
-        # Get Upgrades/Downgrades
-        with st.status("Getting Upgrades/Downgrades") as status:
-            try:
-                upgrades_downgrades = get_analyst_recommendations(ticker_input)
-                if upgrades_downgrades is not None and not upgrades_downgrades.empty:
-                    upgrades_downgrades = upgrades_downgrades[upgrades_downgrades['Action'].isin(['upgraded', 'downgraded'])].head(2)
-                    if not upgrades_downgrades.empty:
-                        upgrades_downgrades_md = ""
-                        for _, row in upgrades_downgrades.iterrows():
-                            upgrades_downgrades_md += f"- {row['Firm']} {row['Action']} the stock to {row['To Grade']}.\n"
-                        report_input += "## Upgrades/Downgrades\n\n"
-                        report_input += "This section outlines the most recent upgrades and downgrades for the stock.\n\n"
-                        report_input += f"{upgrades_downgrades_md}\n"
-                        report_input += "---\n"
-                else:
-                    st.info("No recent upgrades or downgrades available.")
+    # Several comma-separated tickers are researched together, one tab each
+    tickers = list(dict.fromkeys(ticker.strip() for ticker in ticker_input.split(",") if ticker.strip()))
+    if not tickers:
+        st.warning("Please enter at least one ticker.")
+        return
+    containers = dict(zip(tickers, st.tabs(tickers) if len(tickers) > 1 else [st.container()]))
+
+    # Reports are kept per input, so repeated clicks for the same input re-display them
+    # instead of fetching, calling Groq and counting usage again, until they expire
+    report_keys = {ticker: ("report", ticker, report_template, time_period) for ticker in tickers}
+    stored_reports = {ticker: get_stored_report(report_keys[ticker]) for ticker in tickers}
+    missing_reports = [ticker for ticker in tickers if stored_reports[ticker] is None]
+
+    for ticker in tickers:
+        if ticker not in missing_reports:
+            with containers[ticker]:
+                st.markdown(stored_reports[ticker])
+
+    # Only new reports count against the daily limit; stored ones can still be shown and downloaded
+    if usage_count + len(missing_reports) > 5:
+        if usage_count >= 5:
+            st.warning("You have reached your daily limit of 5 reports. Please try again tomorrow.")
+        else:
+            st.warning(f"You can generate {5 - usage_count} more report(s) today. Please research fewer tickers.")
+        missing_reports = []
 
-            except Exception as e:
-                st.error(f"An error occurred while retrieving upgrades/downgrades: {e}")
-            status.update(label="Upgrades/Downgrades checked", state="complete", expanded=False)
+    if missing_reports:
+        st.session_state["topic"] = ticker_input
 
-        # Get Historical Data
-        with st.spinner("Getting Historical Data"):
-            try:
-                historical_data = get_stock_history(ticker_input, period=time_period)
-                if not historical_data.empty:
-                    fig = go.Figure(data=[go.Candlestick(x=historical_data.index,
-                                open=historical_data['Open'],
-                                high=historical_data['High'],
-                                low=historical_data['Low'],
-                                close=historical_data['Close'])])
-                    fig.update_layout(title=f'{ticker_input} Stock Price', xaxis_title='Date', yaxis_title='Price')
-                    st.plotly_chart(fig)
-                    st.success("Historical Data retrieved successfully")
-            except Exception as e:
-                st.error(f"An error occurred while retrieving historical data: {e}")
+        # A pool per run has a worker for every fetch, so no task (nor the news timeout) waits on another session
+        executor = ThreadPoolExecutor(max_workers=FETCHES_PER_TICKER * len(missing_reports) + 1)
+        fetches = {ticker: start_fetches(executor, ticker, time_period, show_chart) for ticker in missing_reports}
+        if download_report_btn:
+            # Build the PDF styles in the background while the report is being generated
+            executor.submit(get_pdf_styles)
+        executor.shutdown(wait=False)
+        report_inputs = {}
+        for ticker in missing_reports:
+            with containers[ticker]:
+                report_inputs[ticker] = collect_report_input(ticker, fetches[ticker], show_chart)
+                if not report_inputs[ticker]:
+                    st.warning(f"No data could be retrieved for {ticker}, so no report was generated.")
+
+        # A report is only generated, and counted against the daily limit, for tickers with data
+        missing_reports = [ticker for ticker in missing_reports if report_inputs[ticker]]
+        if missing_reports:
+            increment_usage(username, len(missing_reports))
 
         # Generate the final report
-        with st.spinner("Generating Report"):
-            try:
-                final_report = generate_report(report_input)
-                st.markdown(final_report)
-            except Exception as e:
-                st.error(f"An error occurred while generating the report: {e}")
-
-        if download_report_btn:
-            try:
-                pdf_buffer = generate_pdf(final_report)
-                report_date = datetime.now().strftime("%Y-%m-%d")
-                filename = f"{ticker_input}_{report_date}_Report.pdf"
-                st.download_button(
-                    label="Download PDF",
-                    data=pdf_buffer,
-                    file_name=filename,
-                    mime="application/pdf"
-                )
-            except Exception as e:
-                st.error(f"An error occurred while generating the PDF: {e}")
+        model = PDF_REPORT_MODEL if download_report_btn else REPORT_MODEL
+        if len(missing_reports) == 1:
+            ticker = missing_reports[0]
+            with containers[ticker]:
+                final_report = get_cached_report(ticker, report_inputs[ticker], model)
+                if final_report is not None:
+                    st.markdown(final_report)
+                    store_report(report_keys[ticker], final_report)
+                else:
+                    with st.spinner("Generating Report"):
+                        try:
+                            final_report = st.write_stream(generate_report(report_inputs[ticker], model))
+                            cache_report(ticker, report_inputs[ticker], model, final_report)
+                            store_report(report_keys[ticker], final_report)
+                        except GroqError as e:
+                            st.error(f"An error occurred while generating the report: {e}")
+        else:
+            final_reports = {ticker: get_cached_report(ticker, report_inputs[ticker], model) for ticker in missing_reports}
+            pending = [ticker for ticker in missing_reports if final_reports[ticker] is None]
+            if pending:
+                try:
+                    with st.spinner("Generating Reports"):
+                        generated = asyncio.run(generate_reports([report_inputs[ticker] for ticker in pending], model))
+                except GroqError as e:
+                    # The client itself failed (e.g. no API key), so every pending report gets the error
+                    generated = [e] * len(pending)
+                for ticker, report in zip(pending, generated):
+                    if isinstance(report, GroqError):
+                        with containers[ticker]:
+                            st.error(f"An error occurred while generating the report: {report}")
+                    elif isinstance(report, Exception):
+                        raise report
+                    else:
+                        cache_report(ticker, report_inputs[ticker], model, report)
+                        final_reports[ticker] = report
+            for ticker, final_report in final_reports.items():
+                if final_report is not None:
+                    with containers[ticker]:
+                        st.markdown(final_report)
+                    store_report(report_keys[ticker], final_report)
+
+    if download_report_btn:
+        report_date = datetime.now().strftime("%Y-%m-%d")
+        for ticker in tickers:
+            final_report = get_stored_report(report_keys[ticker])
+            if final_report is None:
+                continue
+            with containers[ticker]:
+                try:
+                    pdf_data = generate_pdf(final_report)
+                    filename = f"{ticker}_{report_date}_Report.pdf"
+                    st.download_button(
+                        label="Download PDF",
+                        data=pdf_data,
+                        file_name=filename,
+                        mime="application/pdf",
+                        key=f"download_pdf_{ticker}",
+                    )
+                except ValueError as e:
+                    st.error(f"An error occurred while generating the PDF: {e}")
 
 def app():
     st.title("Investa Analyzr :moneybag:")
@@ -432,5 +770,3 @@ def app():
 
 if __name__ == "__main__":
     app()
-
-atexit.register(conn.close)